@@ -1,21 +1,522 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from brotli_asgi import BrotliMiddleware
+from cachetools import LRUCache
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import anyio
+import asyncio
+import blake3
+import orjson
 import uvicorn
 import os
-import tempfile
-from faster_whisper import WhisperModel
-from typing import Optional, Dict
+import psutil
+import threading
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional, Union
 from deep_translator import GoogleTranslator
 
 
+# ---------------- THREADS ----------------
+# this must run before faster_whisper/ctranslate2 are imported: the bundled libgomp
+# reads the OpenMP environment once, when the library is loaded
+
+# concurrent transcriptions (CTranslate2 num_workers)
+CONCURRENCY = max(1, int(os.environ.get("WHISPER_CONCURRENCY", "1")))
+
+
+def available_cpus() -> int:
+    # CPUs this process may really use: the affinity mask, capped by the cgroup CPU quota
+    # (host core counts would badly oversubscribe e.g. a 0.5 vCPU container)
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>", or "max <period>" when unlimited
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, int(quota))
+    return max(1, cpus)
+
+
+CPU_LIMIT = available_cpus()
+
+# size the thread pool from physical cores: hyperthreads only add contention in the decoder
+# matmuls, and the budget is split across workers so concurrent requests don't oversubscribe
+PHYSICAL_CORES = min(psutil.cpu_count(logical=False) or CPU_LIMIT, CPU_LIMIT)
+CPU_THREADS = max(1, min(PHYSICAL_CORES, int(os.environ.get("WHISPER_THREADS", PHYSICAL_CORES))) // CONCURRENCY)
+os.environ["OMP_NUM_THREADS"] = str(CPU_THREADS)
+
+# pin OpenMP threads one per core (libgomp ignores Intel's KMP_AFFINITY). Only with a single
+# worker: every worker's team would bind to the same first cores
+if CONCURRENCY == 1:
+    os.environ.setdefault("OMP_PROC_BIND", "close")
+    os.environ.setdefault("OMP_PLACES", "cores")
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from faster_whisper.transcribe import restore_speech_timestamps
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+
 # ---------------- CONFIG ----------------
 MODEL_SIZE = os.environ.get("WHISPER_MODEL", "small")
 DEVICE = os.environ.get("DEVICE", "cpu")
-COMPUTE_TYPE = os.environ.get("COMPUTE_TYPE", "int8")
+COMPUTE_TYPE = os.environ.get("COMPUTE_TYPE", "auto")
+
+# CPU flags that enable CTranslate2's fast int8 GEMM kernels
+VNNI_FLAGS = ("avx512_vnni", "avx_vnni")
+
+
+def detect_vnni() -> bool:
+    try:
+        import cpuinfo
+        flags = cpuinfo.get_cpu_info().get("flags", [])
+    except Exception as e:
+        print(f"⚠️ CPU flag detection failed: {e}")
+        return False
+    return any(flag in flags for flag in VNNI_FLAGS)
+
+
+HAS_VNNI = detect_vnni()
+
+
+def resolve_compute_type(compute_type: str, device: str) -> str:
+    # int8 weights on every CPU: float32 needs ~4x the RAM, too much for small instances.
+    # On CPU CTranslate2 runs "int8" as int8_float32, so use the name it actually reports
+    if compute_type != "auto" or device != "cpu":
+        return compute_type
+    if not HAS_VNNI:
+        print("⚠️ No AVX512-VNNI/AVX-VNNI: int8 kernels may be slow; COMPUTE_TYPE=float32 trades ~4x RAM for speed")
+    return "int8_float32"
+
+
+RESOLVED_COMPUTE_TYPE = resolve_compute_type(COMPUTE_TYPE, DEVICE)
+
+# "faster-whisper" (CTranslate2) or "whispercpp" (ggml quantized weights)
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "faster-whisper")
+WHISPER_QUANT = os.environ.get("WHISPER_QUANT", "q5_1")  # q4_0 | q5_1 | q8_0
+WHISPER_CPP_MODEL = os.environ.get("WHISPER_CPP_MODEL")  # path to a pre-quantized ggml file
+
+# windows decoded per batch by BatchedInferencePipeline; <= 1 decodes sequentially
+BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "8"))
+
+# greedy decoding by default; beam search multiplies decoder work by the beam width.
+# set WHISPER_BEAM=5 for WER-sensitive workloads
+BEAM_SIZE = int(os.environ.get("WHISPER_BEAM", "1"))
+
+# the service is tuned for Hindi: pinning the language skips Whisper's detection pass.
+# WHISPER_LANG=auto detects per request; a ?language= query parameter always wins
+DEFAULT_LANGUAGE = os.environ.get("WHISPER_LANG", "hi")
+HINDI_PROMPT = os.environ.get("WHISPER_PROMPT", "नमस्ते, यह बातचीत हिंदी में है।")
+
+SAMPLE_RATE = 16000  # Whisper expects 16 kHz mono float32 PCM
+
+# transcription results cached by BLAKE3 hash of the upload; 0 disables
+CACHE_SIZE = int(os.environ.get("TRANSCRIBE_CACHE_SIZE", "256"))
+HASH_CHUNK_SIZE = 1 << 20
+
+# Silero VAD runs once per request on the decoded PCM; lower the threshold for whispered speech
+VAD_THRESHOLD = float(os.environ.get("VAD_THRESHOLD", "0.5"))
+VAD_OPTIONS = VadOptions(
+    threshold=VAD_THRESHOLD,
+    min_silence_duration_ms=500,
+    max_speech_duration_s=30,  # merged chunks must fit one Whisper window
+)
+
+# "google" (deep-translator HTTP call) or "local" (NLLB-200 on CTranslate2, opt-in: the
+# converted model is not part of the image and needs ~600 MB of RAM on top of Whisper)
+TRANSLATOR = os.environ.get("TRANSLATOR", "google")
+TRANSLATOR_MODEL_DIR = os.environ.get("TRANSLATOR_MODEL_DIR", "nllb-200-distilled-600M-int8")
+# "auto" keeps the converted int8 weights like the Whisper model; float32 is an opt-in for
+# hosts without VNNI and dequantizes the 600M-parameter model to ~2.4 GB
+TRANSLATOR_COMPUTE_TYPE = os.environ.get("TRANSLATOR_COMPUTE_TYPE", "auto")
+if TRANSLATOR_COMPUTE_TYPE == "auto":
+    TRANSLATOR_COMPUTE_TYPE = "int8"
+
+# Whisper language code -> NLLB-200 language code
+NLLB_LANG_CODES = {
+    "hi": "hin_Deva",
+    "ur": "urd_Arab",
+}
+NLLB_TARGET = "hin_Deva"
+# segments per translate_batch call: bounds the padded beam-search batch on long uploads
+TRANSLATOR_BATCH_SIZE = 16
+
+# ---------------- WHISPER.CPP BACKEND ----------------
+@dataclass
+class CppSegment:
+    start: float
+    end: float
+    text: str
+    words: Optional[list] = None
+
+
+class CppInfo(NamedTuple):
+    language: str
+    duration: Optional[float]
+
+
+class WhisperCppModel:
+    """whisper.cpp model exposing the faster-whisper transcribe() interface."""
+
+    def __init__(self, model_ref: str):
+        import _pywhispercpp as pw
+        from pywhispercpp.model import Model
+
+        self._pw = pw
+        self._model = Model(
+            model_ref,
+            n_threads=CPU_THREADS,
+            print_progress=False,
+            print_realtime=False,
+        )
+        # a whisper.cpp context cannot run two decodes at once
+        self._lock = threading.Lock()
+
+    def transcribe(
+        self,
+        audio,
+        language: Optional[str] = None,
+        temperature: Union[float, List[float]] = 0.0,
+        initial_prompt: Optional[str] = None,
+        beam_size: int = 1,
+        **_,
+    ):
+        # a single-temperature schedule means no fallback re-decodes
+        temperatures = temperature if isinstance(temperature, (list, tuple)) else [temperature]
+        strategies = self._pw.whisper_sampling_strategy
+        params = {
+            "language": language or "auto",
+            # whisper.cpp only reads beam_size under the beam-search strategy
+            "strategy": strategies.WHISPER_SAMPLING_BEAM_SEARCH if beam_size > 1 else strategies.WHISPER_SAMPLING_GREEDY,
+            "beam_search": {"beam_size": beam_size, "patience": -1.0},
+            "temperature": temperatures[0],
+            "temperature_inc": 0.0 if len(temperatures) == 1 else 0.2,
+            # pywhispercpp keeps params between calls and its setter only accepts str:
+            # "" clears a previous request's prompt, None would raise TypeError
+            "initial_prompt": initial_prompt or "",
+        }
+        with self._lock:
+            segments = self._model.transcribe(audio, **params)
+            # the language whisper.cpp decoded with (detected when "auto"), read from the
+            # context before another decode replaces it
+            detected = self._pw.whisper_lang_str(self._pw.whisper_full_lang_id(self._model._ctx))
+        # whisper.cpp timestamps are in units of 10 ms
+        return (
+            (CppSegment(s.t0 / 100, s.t1 / 100, s.text) for s in segments),
+            CppInfo(detected or language or "unknown", len(audio) / SAMPLE_RATE),
+        )
+
+
+# ---------------- LOCAL TRANSLATOR ----------------
+class NllbTranslator:
+    """NLLB-200 translator converted to a CTranslate2 model."""
+
+    def __init__(self, model_dir: str):
+        import ctranslate2
+        import sentencepiece
+
+        self._translator = ctranslate2.Translator(
+            model_dir,
+            device="cpu",
+            compute_type=TRANSLATOR_COMPUTE_TYPE,
+            inter_threads=CONCURRENCY,
+            intra_threads=CPU_THREADS,
+        )
+        self._sp = sentencepiece.SentencePieceProcessor(
+            model_file=os.path.join(model_dir, "sentencepiece.bpe.model")
+        )
+
+    def translate(self, texts: List[str], source: str, target: str = NLLB_TARGET) -> str:
+        # one batch entry per Whisper segment: segments span at most 30 s of audio, so
+        # each stays well inside CTranslate2's input/decoding length limits
+        tokens = [[source, *pieces, "</s>"] for pieces in self._sp.encode(texts, out_type=str)]
+        # max_batch_size also makes CTranslate2 sort entries by length to cut padding
+        results = self._translator.translate_batch(
+            tokens,
+            target_prefix=[[target]] * len(tokens),
+            max_batch_size=TRANSLATOR_BATCH_SIZE,
+        )
+        # drop the target language token NLLB emits first
+        return " ".join(self._sp.decode([r.hypotheses[0][1:] for r in results]))
+
+
+def google_translate(texts: List[str]) -> str:
+    return GoogleTranslator(source="auto", target="hi").translate(" ".join(texts))
+
+
+# ---------------- MODEL LOAD ----------------
+def load_model():
+    if WHISPER_BACKEND == "whispercpp":
+        model_ref = WHISPER_CPP_MODEL or f"{MODEL_SIZE}-{WHISPER_QUANT}"
+        print(f"🚀 Loading whisper.cpp model: {model_ref}")
+        try:
+            return WhisperCppModel(model_ref), "whispercpp"
+        except Exception as e:
+            print(f"⚠️ whisper.cpp backend unavailable, falling back to faster-whisper: {e}")
+
+    print(f"🚀 Loading Whisper model: {MODEL_SIZE} on {DEVICE} ({RESOLVED_COMPUTE_TYPE}, requested {COMPUTE_TYPE})")
+    print(f"🧵 Threads: {CPU_THREADS} per worker x {CONCURRENCY} workers ({PHYSICAL_CORES} usable physical cores)")
+    whisper = WhisperModel(
+        MODEL_SIZE,
+        device=DEVICE,
+        compute_type=RESOLVED_COMPUTE_TYPE,
+        cpu_threads=CPU_THREADS,
+        num_workers=CONCURRENCY,
+    )
+    return whisper, "faster-whisper"
+
+
+def load_translator() -> Optional[NllbTranslator]:
+    if TRANSLATOR != "local":
+        return None
+    try:
+        if TRANSLATOR_COMPUTE_TYPE == "float32":
+            print("⚠️ Local translator in float32 needs ~2.4 GB of RAM; use TRANSLATOR_COMPUTE_TYPE=int8 on small instances")
+        local = NllbTranslator(TRANSLATOR_MODEL_DIR)
+        print(f"✅ Local translator loaded: {TRANSLATOR_MODEL_DIR} ({TRANSLATOR_COMPUTE_TYPE})")
+        return local
+    except Exception as e:
+        print(f"⚠️ Local translator unavailable, using Google Translate: {e}")
+        return None
+
+
+# ---------------- WARMUP ----------------
+def warmup(state):
+    # one second of silence forces kernel selection, thread pools and the VAD graph to load now
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    get_speech_timestamps(silence, VAD_OPTIONS)
+
+    segments, _ = state.model.transcribe(silence, beam_size=1, vad_filter=False)
+    list(segments)
+    if state.batched is not None:
+        segments, _ = state.batched.transcribe(silence, beam_size=1, batch_size=1, vad_filter=False)
+        list(segments)
+
+
+async def warm_up(state):
+    # runs after startup so /health can answer 503 meanwhile; ready only flips on success.
+    # it holds a decode slot like a request, so early requests queue instead of oversubscribing
+    try:
+        await anyio.to_thread.run_sync(warmup, state, limiter=state.transcribe_limiter)
+    except Exception as e:
+        print(f"⚠️ Warmup failed, /health stays unavailable: {e}")
+        return
+    state.ready = True
+    print("🔥 Warmup complete")
+
+
+# ---------------- VAD WINDOWS ----------------
+def clip_windows(speech_chunks, max_duration_s: float = 30) -> list:
+    # Whisper-sized windows over the stitched speech audio, in seconds; each window
+    # holds whole VAD chunks, so no silence between chunks is ever decoded
+    windows = []
+    offset = 0.0
+    for chunk in speech_chunks:
+        length = (chunk["end"] - chunk["start"]) / SAMPLE_RATE
+        if windows and offset + length - windows[-1]["start"] <= max_duration_s:
+            windows[-1]["end"] = offset + length
+        else:
+            windows.append({"start": offset, "end": offset + length})
+        offset += length
+    return windows
+
+
+# ---------------- TRANSCRIPTION ----------------
+def start_transcription(state, audio, speech_chunks, transcribe_kwargs):
+    # decode only the speech: stitch the VAD chunks together, then map timestamps back
+    trimmed = np.concatenate([audio[c["start"]:c["end"]] for c in speech_chunks])
+    if state.batched is not None:
+        segments_gen, info = state.batched.transcribe(
+            trimmed,
+            batch_size=BATCH_SIZE,
+            clip_timestamps=clip_windows(speech_chunks),
+            **transcribe_kwargs,
+        )
+    else:
+        segments_gen, info = state.model.transcribe(trimmed, **transcribe_kwargs)
+    return restore_speech_timestamps(segments_gen, speech_chunks, SAMPLE_RATE), info
+
+
+def hash_upload(fileobj) -> str:
+    hasher = blake3.blake3()
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        hasher.update(chunk)
+    fileobj.seek(0)
+    return hasher.hexdigest()
+
+
+def segment_dict(i: int, seg) -> dict:
+    return {
+        "id": i,
+        "start": seg.start,
+        "end": seg.end,
+        "text": seg.text.strip()
+    }
+
+
+def collect_segments(segments_gen):
+    segments = []
+    texts = []
+
+    for i, seg in enumerate(segments_gen):
+        item = segment_dict(i, seg)
+        segments.append(item)
+        texts.append(item["text"])
+
+    return segments, texts
+
+
+def devanagari_ratio(text: str) -> float:
+    return sum(1 for c in text if "\u0900" <= c <= "\u097F") / max(1, len(text))
+
+
+async def translate_transcript(state, texts: List[str], final_text: str, detected_lang: str):
+    """Returns (translated_text, ok); ok is False when the translation attempt failed."""
+    # Hindi that Whisper already wrote in Devanagari needs no "translation" to Hindi
+    if detected_lang == "hi" and devanagari_ratio(final_text) > 0.5:
+        return final_text, True
+
+    # Translate / Normalize
+    translated_text = final_text
+    if final_text and detected_lang in ["hi", "ur", "unknown"]:
+        texts = list(filter(None, texts))
+        source = NLLB_LANG_CODES.get(detected_lang)
+        try:
+            if state.translator is not None and source:
+                # NLLB runs on CPU_THREADS like a decode, so it takes a decode slot
+                translated_text = await anyio.to_thread.run_sync(
+                    state.translator.translate, texts, source, limiter=state.transcribe_limiter
+                )
+            else:
+                # the Google call is network-bound and stays in the default threadpool
+                translated_text = await run_in_threadpool(google_translate, texts)
+        except Exception as tr:
+            print("⚠️ Translation failed:", tr)
+            return translated_text, False
+    return translated_text, True
+
+
+def build_result(final_text, translated_text, segments, detected_lang, duration) -> dict:
+    return {
+        "original_text": final_text,
+        "translated_text": translated_text,
+        "segments": segments,
+        "info": {
+            "detected_language": detected_lang,
+            "duration": duration
+        }
+    }
+
+
+def json_response(result: dict) -> Response:
+    # encode with orjson directly: returning the dict would first run FastAPI's
+    # jsonable_encoder over every segment, which costs far more than the encoding itself
+    return Response(orjson.dumps(result), media_type="application/json")
+
+
+# ---------------- STREAMING ----------------
+def ndjson_line(obj) -> bytes:
+    return orjson.dumps(obj) + b"\n"
+
+
+def summary_line(result: dict) -> bytes:
+    return ndjson_line({k: v for k, v in result.items() if k != "segments"})
+
+
+async def stream_transcription(state, segments_gen, detected_lang, duration, cache_key):
+    # one line per segment as it is decoded, then a trailing summary with the full text
+    iterator = iter(segments_gen)
+    segments = []
+    texts = []
+    try:
+        while True:
+            seg = await anyio.to_thread.run_sync(
+                next, iterator, None, limiter=state.transcribe_limiter
+            )
+            if seg is None:
+                break
+
+            item = segment_dict(len(texts), seg)
+            texts.append(item["text"])
+            # segments are only held on to when they are going into the cache
+            if cache_key is not None:
+                segments.append(item)
+            yield ndjson_line(item)
+
+        final_text = " ".join(filter(None, texts))
+        translated_text, translated = await translate_transcript(state, texts, final_text, detected_lang)
+        result = build_result(final_text, translated_text, segments, detected_lang, duration)
+        # a failed translation must not be pinned in the cache for this audio
+        if cache_key is not None and translated:
+            state.cache[cache_key] = result
+
+        yield summary_line(result)
+
+    except Exception as e:
+        # headers are already sent, so report the failure in-band
+        yield ndjson_line({"error": f"Transcription failed: {e}"})
+
+
+async def stream_result(result: dict):
+    for item in result["segments"]:
+        yield ndjson_line(item)
+    yield summary_line(result)
+
+
+# ---------------- LIFESPAN ----------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # everything loads once per process; concurrency comes from num_workers plus worker
+    # threads rather than uvicorn --workers, so the weights are never duplicated in RAM
+    state = app.state
+    state.ready = False
+
+    try:
+        state.model, state.backend = load_model()
+        print(f"✅ Whisper model loaded successfully! (backend: {state.backend})")
+    except Exception as e:
+        print(f"❌ Model load failed: {e}")
+        raise RuntimeError(f"Model load error: {e}")
+
+    # batch VAD-chunked windows through the decoder instead of one at a time
+    state.batched = None
+    if state.backend == "faster-whisper" and BATCH_SIZE > 1:
+        state.batched = BatchedInferencePipeline(model=state.model)
+        print(f"📦 Batched inference enabled (batch_size={BATCH_SIZE})")
+
+    state.translator = load_translator()
+    state.cache = LRUCache(maxsize=CACHE_SIZE) if CACHE_SIZE > 0 else None
+
+    # bounds concurrent decodes and local translations so N simultaneous requests don't
+    # oversubscribe the OMP threads
+    state.transcribe_limiter = anyio.CapacityLimiter(CONCURRENCY)
+
+    warmup_task = asyncio.create_task(warm_up(state))
+
+    yield
+
+    warmup_task.cancel()
+
 
 # ---------------- APP INIT ----------------
-app = FastAPI(title="🎧 Whisper Transcriber", version="3.2")
+app = FastAPI(title="🎧 Whisper Transcriber", version="3.2", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +526,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# segment JSON repeats the same keys thousands of times and compresses very well.
+# brotli runs innermost for clients that accept it; the outer gzip layer leaves its
+# already-encoded responses alone and handles gzip-only clients at level 5 (brotli-asgi's
+# own gzip fallback is fixed at level 9)
+app.add_middleware(BrotliMiddleware, quality=4, minimum_size=1024, gzip_fallback=False)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # ---------------- OPTIONS FIX (critical!) ----------------
 @app.options("/transcribe")
 async def options_transcribe():
@@ -39,98 +547,124 @@ async def options_transcribe():
     )
 
 
-# ---------------- MODEL LOAD ----------------
-print(f"🚀 Loading Whisper model: {MODEL_SIZE} on {DEVICE} ({COMPUTE_TYPE})")
-try:
-    model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
-    print("✅ Whisper model loaded successfully!")
-except Exception as e:
-    print(f"❌ Model load failed: {e}")
-    raise RuntimeError(f"Model load error: {e}")
-
-
 # ---------------- ROUTES ----------------
 @app.get("/health")
-async def health() -> Dict[str, str]:
-    return {"status": "ok", "model": MODEL_SIZE, "device": DEVICE}
+async def health(request: Request):
+    state = request.app.state
 
+    # keep load balancers off this worker until the model is warm
+    if not getattr(state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
 
-@app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...), language: Optional[str] = None):
+    return {
+        "status": "ok",
+        "model": MODEL_SIZE,
+        "device": DEVICE,
+        "backend": state.backend,
+        "compute_type": RESOLVED_COMPUTE_TYPE,
+    }
 
-    tmp_path = None
-    try:
-        # save temp file
-        suffix = os.path.splitext(file.filename)[1] or ".mp3"
-        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-            tmp_path = tmp.name
-            tmp.write(await file.read())
 
+@app.post("/transcribe")
+async def transcribe(
+    request: Request,
+    file: UploadFile = File(...),
+    language: Optional[str] = None,
+    stream: bool = False,
+):
+    state = request.app.state
+    try:
         print(f"🎵 Received file: {file.filename}")
 
         transcribe_kwargs = {
-            "beam_size": 5,
-            "vad_filter": True,
-            "temperature": 0.2,
+            "task": "transcribe",
+            "beam_size": BEAM_SIZE,
+            "best_of": 1,
+            "patience": 1,
+            "condition_on_previous_text": False,
+            "vad_filter": False,  # VAD already applied below
+            # a single temperature disables the fallback cascade that re-decodes
+            # low-confidence windows at higher temperatures
+            "temperature": [0.0],
+            "compression_ratio_threshold": 2.4,
+            "no_speech_threshold": 0.6,
         }
 
+        if not language and DEFAULT_LANGUAGE != "auto":
+            language = DEFAULT_LANGUAGE
+
         if language:
             transcribe_kwargs["language"] = language
-            print("🌐 Using provided language:", language)
+            # a short seed in the target script stabilizes the first window. Sequential decoding
+            # drops it after that window; the batched pipeline would prompt every VAD window
+            # with it, making Whisper echo the greeting on short or noisy chunks
+            if language == "hi" and HINDI_PROMPT and state.batched is None:
+                transcribe_kwargs["initial_prompt"] = HINDI_PROMPT
+            print("🌐 Using language:", language)
         else:
             print("🌐 Auto-detecting language...")
 
-        # Whisper transcribe
-        segments_gen, info = model.transcribe(tmp_path, **transcribe_kwargs)
-        detected_lang = getattr(info, "language", "unknown")
+        # repeat uploads are served from the cache; the key covers everything that changes the output
+        cache_key = None
+        if state.cache is not None:
+            digest = await run_in_threadpool(hash_upload, file.file)
+            cache_key = f"{digest}:{MODEL_SIZE}:{state.backend}:{sorted(transcribe_kwargs.items())!r}"
+            cached = state.cache.get(cache_key)
+            if cached is not None:
+                print("⚡ Cache hit")
+                if stream:
+                    return StreamingResponse(stream_result(cached), media_type="application/x-ndjson")
+                return json_response(cached)
+
+        # decode once in-process straight from the upload, no temp file / ffmpeg fork. Decoding
+        # and Silero VAD each use a single thread, so they stay outside the decode limiter
+        audio = await run_in_threadpool(decode_audio, file.file, sampling_rate=SAMPLE_RATE)
+
+        # Voice activity detection, once per request
+        speech_chunks = await run_in_threadpool(get_speech_timestamps, audio, VAD_OPTIONS)
+        print(f"🗣️ Speech chunks: {len(speech_chunks)}")
+
+        # Whisper transcribe, off the event loop and capped at CONCURRENCY decodes
+        segments_gen, detected_lang = (), language or "unknown"
+        if speech_chunks:
+            segments_gen, info = await anyio.to_thread.run_sync(
+                start_transcription, state, audio, speech_chunks, transcribe_kwargs,
+                limiter=state.transcribe_limiter,
+            )
+            detected_lang = info.language
 
         print(f"✅ Detected Language: {detected_lang}")
 
-        segments = []
-        texts = []
-
-        for i, seg in enumerate(segments_gen):
-            text = seg.text.strip()
-            segments.append({
-                "id": i,
-                "start": float(seg.start),
-                "end": float(seg.end),
-                "text": text
-            })
-            texts.append(text)
-
-        final_text = " ".join(texts).strip()
-
-        # Translate / Normalize
-        translated_text = final_text
-        if detected_lang in ["hi", "ur", "unknown"]:
-            try:
-                translated_text = GoogleTranslator(
-                    source="auto",
-                    target="hi"
-                ).translate(final_text)
-            except Exception as tr:
-                print("⚠️ Translation failed:", tr)
-
-        return {
-            "original_text": final_text,
-            "translated_text": translated_text,
-            "segments": segments,
-            "info": {
-                "detected_language": detected_lang,
-                "duration": getattr(info, "duration", None)
-            }
-        }
+        duration = len(audio) / SAMPLE_RATE
+        if stream:
+            return StreamingResponse(
+                stream_transcription(state, segments_gen, detected_lang, duration, cache_key),
+                media_type="application/x-ndjson",
+            )
+
+        # segments are decoded lazily, so consuming the generator is the expensive part
+        segments, texts = await anyio.to_thread.run_sync(
+            collect_segments, segments_gen, limiter=state.transcribe_limiter
+        )
+
+        # texts are already stripped; skip empty ones instead of re-stripping the joined string
+        final_text = " ".join(filter(None, texts))
+        translated_text, translated = await translate_transcript(state, texts, final_text, detected_lang)
+        result = build_result(final_text, translated_text, segments, detected_lang, duration)
+
+        # only reached from the event loop thread, so the cache needs no lock; a failed
+        # translation is not cached so the next upload of this audio retries it
+        if cache_key is not None and translated:
+            state.cache[cache_key] = result
+
+        return json_response(result)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
 
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except:
-                pass
+        # UploadFile.close() unlinks a rolled-over spool file in the threadpool
+        await file.close()
 
 
 # ---------------- RUN SERVER ----------------
@@ -1,2 +1,3 @@
 #!/bin/bash
+# one worker: the model is loaded once per process, parallelism comes from WHISPER_CONCURRENCY
 uvicorn app:app --host 0.0.0.0 --port ${PORT:-10000} --workers 1